@@ -8,6 +8,16 @@ from typing import List, Dict, Any, Set, Iterable
 
 # Предполагаем, что config.py доступен в том же каталоге
 from config import API_KEY, LEAGUE_IDS
+from metrics import API_REQUEST_DURATION, API_REQUEST_ERRORS, API_QUOTA_REMAINING, ALERTS_TOTAL, DEDUP_SET_SIZE
+from bot_logging import get_logger, fields
+from profiling import profiler
+from rendering import Alert, fixture_header
+
+api_log = get_logger("api")
+cache_log = get_logger("cache")
+parse_log = get_logger("parse")
+event_log = get_logger("event")
+stats_log = get_logger("stats")
 
 HEADERS = {
     "x-apisports-key": API_KEY
@@ -25,21 +35,34 @@ def load_sent_events() -> Set[str]:
             data = json.load(f)
             return set(data) if isinstance(data, list) else set()
     except Exception as e:
-        print(f"[CACHE ERROR] Failed to load sent events: {e}")
+        cache_log.error("Failed to load sent events", extra=fields(error=e))
         return set()
 
 def save_sent_events(events: Set[str]):
     """Сохраняет хеши отправленных событий в файл."""
     temp_file = EVENTS_CACHE_FILE + ".tmp"
     try:
-        with open(temp_file, "w") as f:
-            json.dump(list(events), f)
-        os.replace(temp_file, EVENTS_CACHE_FILE)
+        with profiler.stage("save"):
+            with open(temp_file, "w") as f:
+                json.dump(list(events), f)
+            os.replace(temp_file, EVENTS_CACHE_FILE)
     except Exception as e:
-        print(f"[CACHE ERROR] Failed to save sent events: {e}")
+        cache_log.error("Failed to save sent events", extra=fields(error=e))
         if os.path.exists(temp_file):
             os.remove(temp_file)
 
+def _record_quota(r: requests.Response):
+    """Сохраняет остаток квоты API из заголовков ответа."""
+    for header, window in (("x-ratelimit-requests-remaining", "day"), ("X-RateLimit-Remaining", "minute")):
+        value = r.headers.get(header)
+        if value is not None and str(value).isdigit():
+            API_QUOTA_REMAINING.set(int(value), window=window)
+
+def _event_key(raw: str) -> str:
+    """md5-ключ события для кэша отправленных."""
+    with profiler.stage("hash"):
+        return hashlib.md5(raw.encode()).hexdigest()
+
 # Global caches to prevent duplicates
 sent_events: Set[str] = load_sent_events() # ЗАГРУЗКА ПРИ СТАРТЕ
 last_corners: Dict[int, tuple[int, int]] = {}
@@ -52,23 +75,27 @@ def get_fixture_statistics(fid: int) -> list[dict] | None:
     """Отдельным запросом получает подробную статистику матча."""
     url = "https://v3.football.api-sports.io/fixtures/statistics"
     params = {"fixture": fid}
-    print(f"[API] Fetching STATS for #{fid}")
+    api_log.debug("Fetching statistics", extra=fields(fid=fid))
     
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        with API_REQUEST_DURATION.time(endpoint="fixtures/statistics"), profiler.stage("http"):
+            r = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        _record_quota(r)
         r.raise_for_status()
-        data = r.json()
+        with profiler.stage("json"):
+            data = r.json()
         
         response_data = data.get("response")
         
         if not response_data:
-            print(f"[API STATS] No statistics data found for #{fid}.")
+            api_log.debug("No statistics data found", extra=fields(fid=fid))
             return None
             
         return response_data
         
     except Exception as e:
-        print(f"[API STATS ERROR] #{fid}: {e}")
+        API_REQUEST_ERRORS.inc(endpoint="fixtures/statistics")
+        api_log.warning("Statistics request failed", extra=fields(fid=fid, error=e))
         return None
 # ==============================================================================
 
@@ -79,30 +106,35 @@ def get_live_fixtures() -> list[dict]:
     url = "https://v3.football.api-sports.io/fixtures"
     params = {"live": "all"} # Запрос всех live-матчей
 
-    print(f"\n[API] Fetching ALL LIVE fixtures.")
+    api_log.debug("Fetching all live fixtures")
 
     try:
-        r = requests.get(
-            url,
-            headers=HEADERS,
-            params=params,
-            timeout=15
-        )
+        with API_REQUEST_DURATION.time(endpoint="fixtures"), profiler.stage("http"):
+            r = requests.get(
+                url,
+                headers=HEADERS,
+                params=params,
+                timeout=15
+            )
+        _record_quota(r)
 
         r.raise_for_status()
 
-        data = r.json()
+        with profiler.stage("json"):
+            data = r.json()
         fixtures = data.get("response", [])
         
-        print(f"[API] Received {len(fixtures)} live fixtures (UNFILTERED).")
+        api_log.info("Received live fixtures", extra=fields(count=len(fixtures)))
         
         return fixtures
 
     except requests.exceptions.HTTPError as http_err:
-        print(f"[API ERROR] HTTP Error occurred: {http_err}")
+        API_REQUEST_ERRORS.inc(endpoint="fixtures")
+        api_log.error("HTTP error while fetching fixtures", extra=fields(error=http_err))
         return []
     except Exception as e:
-        print(f"[API ERROR] Unexpected error during request: {e}")
+        API_REQUEST_ERRORS.inc(endpoint="fixtures")
+        api_log.error("Unexpected error while fetching fixtures", extra=fields(error=e))
         return []
 
 
@@ -111,40 +143,31 @@ def is_top5_league(fixture: dict) -> bool:
     return fixture["league"]["id"] in LEAGUE_IDS
 
 
-def parse_events(fixture: dict, is_tracked_match: bool) -> list[str]:
+def parse_events(fixture: dict, is_tracked_match: bool) -> list[Alert]:
     """
-    Parse match events and statistics, return formatted messages.
+    Parse match events and statistics, return alerts (текст собирает rendering.render_alert).
     Аргумент is_tracked_match сохранен, так как он нужен для условного запроса статистики.
     """
-    messages: list[str] = []
-    fid = fixture["fixture"]["id"]
+    messages: list[Alert] = []
+    # Заголовок не форматируется здесь: rendering кэширует его по счёту и туру
+    header = fixture_header(fixture)
+    fid = header.fid
 
-    home = fixture["teams"]["home"]["name"]
-    away = fixture["teams"]["away"]["name"]
+    home = header.home
+    away = header.away
 
-    gh = fixture["goals"]["home"] or 0
-    ga = fixture["goals"]["away"] or 0
+    gh = header.gh
+    ga = header.ga
     
     # 1. Получаем старый счет из кэша для проверки разницы
     old_gh, old_ga = last_scores.get(fid, (0, 0)) 
     
-    score = f"{gh} : {ga}"
-    league = fixture["league"]["name"]
-    league_id = fixture["league"]["id"]
-
-    flag = {
-        39: "🏴", 140: "🇪🇸", 135: "🇮🇹",
-        78: "🇩🇪", 61: "🇫🇷"
-    }.get(league_id, "")
-
-    round_info = fixture["league"].get("round", "").replace("Regular Season - ", "Matchday ")
-
-    header = f"<b>{flag} {league}</b>\n{round_info}\n\n<b>{home} {score} {away}</b>"
+    league = header.league
 
     # Обновляем кэш счета 
     last_scores[fid] = (gh, ga)
     
-    print(f"[PARSE] Analyzing Fixture #{fid}: {home} {gh}-{ga} {away} ({league}). Tracked: {is_tracked_match}")
+    parse_log.debug("Analyzing fixture", extra=fields(fid=fid, home=home, away=away, score=f"{gh}-{ga}", league=league, tracked=is_tracked_match))
 
     # ====================== SCORE DISCREPANCY CHECK (Проверка счета) ======================
     is_goal_in_events_list = any(ev["type"] == "Goal" for ev in fixture.get("events", []))
@@ -158,67 +181,71 @@ def parse_events(fixture: dict, is_tracked_match: bool) -> list[str]:
         
         if scorer_team:
             time_elapsed = fixture["fixture"]["status"].get("elapsed", "??")
-            synthetic_key = hashlib.md5(f"{fid}_{time_elapsed}_GOAL_SYNTHETIC_{gh}{ga}".encode()).hexdigest()
+            synthetic_key = _event_key(f"{fid}_{time_elapsed}_GOAL_SYNTHETIC_{gh}{ga}")
             
             if synthetic_key not in sent_events:
                 sent_events.add(synthetic_key)
                 
-                msg = (
-                    f"⚽️ GOAL (Score Update via API)!\n"
-                    f"Team: {scorer_team} leads to {gh}-{ga}\nMinute: {time_elapsed}'"
-                )
-                print(f"[EVENT-FIX] Synthetic Goal event created for #{fid}: {scorer_team} ({gh}-{ga})")
-                messages.append(f"{header}\n\n{msg}\n──────────────────")
+                event_log.info("Synthetic goal event created", extra=fields(fid=fid, team=scorer_team, score=f"{gh}-{ga}"))
+                ALERTS_TOTAL.inc(type="goal_synthetic")
+                messages.append(Alert(header, "goal_synthetic", {
+                    "team": scorer_team, "gh": gh, "ga": ga, "minute": time_elapsed,
+                }))
 
     # ====================== EVENTS PROCESSING (Обработка событий) ======================
     for ev in fixture.get("events", []):
-        key = hashlib.md5(
-            f"{fid}_{ev['time']['elapsed']}_{ev['type']}_{ev['detail']}_{ev['team']['id']}".encode()
-        ).hexdigest()
+        key = _event_key(
+            f"{fid}_{ev['time']['elapsed']}_{ev['type']}_{ev['detail']}_{ev['team']['id']}"
+        )
 
         if key in sent_events:
             continue
         sent_events.add(key)
         
-        print(f"[EVENT] New event found for #{fid}: Type='{ev['type']}', Detail='{ev['detail']}', Min='{ev['time']['elapsed']}'")
+        event_log.info("New event found", extra=fields(fid=fid, type=ev['type'], detail=ev['detail'], minute=ev['time']['elapsed']))
 
         minute = ev["time"]["elapsed"]
         extra = ev["time"].get("extra")
         time_str = f"{minute}{'+' + str(extra) if extra else ''}'"
 
-        msg = ""
+        alert = None
 
+        # Имена игроков: None -> шаблон подставит "Unknown Player" на нужном языке
         if ev["type"] == "Goal":
-            player = ev.get("player", {}).get("name", "Unknown Player")
-            assist = ev.get("assist", {}).get("name") or "no assist"
-            own = " (Own Goal)" if "own" in ev["detail"].lower() else ""
-            pen = " (Penalty)" if "penalty" in ev["detail"].lower() else ""
-
-            msg = (
-                f"⚽️ GOAL{own}{pen}!\n"
-                f"Scorer: {player}\nAssist: {assist}\n{time_str}"
-            )
+            alert = Alert(header, "goal", {
+                "player": (ev.get("player") or {}).get("name"),
+                "assist": (ev.get("assist") or {}).get("name"),
+                "own": "own" in ev["detail"].lower(),
+                "penalty": "penalty" in ev["detail"].lower(),
+                "time": time_str,
+            })
 
         elif ev["type"] == "Card":
-            card = "🟨 Yellow Card" if "yellow" in ev["detail"].lower() else "🟥 Red Card"
-            player = ev.get("player", {}).get("name", "Unknown Player")
-            msg = f"{card}\nPlayer: {player}\n{time_str}"
+            kind = "card_yellow" if "yellow" in ev["detail"].lower() else "card_red"
+            alert = Alert(header, kind, {
+                "player": (ev.get("player") or {}).get("name"),
+                "time": time_str,
+            })
 
         elif ev["type"].lower() == "subst":
             team = home if ev["team"]["id"] == fixture["teams"]["home"]["id"] else away
-            out_p = ev.get("player", {}).get("name", "Unknown Player")
-            in_p = ev.get("assist", {}).get("name", "Unknown Player")
-            msg = f"🔄 Substitution ({team})\n{out_p} → {in_p}\n{time_str}"
+            alert = Alert(header, "subst", {
+                "team": team,
+                "player_out": (ev.get("player") or {}).get("name"),
+                "player_in": (ev.get("assist") or {}).get("name"),
+                "time": time_str,
+            })
 
         elif ev["type"].lower() == "var":
-            msg = f"🖥️ VAR Check — {ev['detail']}\n{time_str}"
+            alert = Alert(header, "var", {"detail": ev["detail"], "time": time_str})
             
         elif ev["type"] == "Corner":
             team = home if ev["team"]["id"] == fixture["teams"]["home"]["id"] else away
-            msg = f"📐 Corner for {team}\n{time_str}"
+            alert = Alert(header, "corner", {"team": team, "time": time_str})
 
-        if msg:
-            messages.append(f"{header}\n\n{msg}\n──────────────────")
+        if alert:
+            ALERTS_TOTAL.inc(type=ev["type"].lower())
+            messages.append(alert)
 
     # ====================== STATISTICS (Статистика - ОПТИМИЗИРОВАНО) ======================
     stats = fixture.get("statistics")
@@ -247,12 +274,12 @@ def parse_events(fixture: dict, is_tracked_match: bool) -> list[str]:
 
         # --- УГЛОВЫЕ (С ЗАЩИТОЙ ОТ ДУБЛИРОВАНИЯ) ---
         if last_corners.get(fid) != (ch, ca):
-            corner_key = hashlib.md5(f"{fid}_CORNERS_{ch}-{ca}".encode()).hexdigest()
+            corner_key = _event_key(f"{fid}_CORNERS_{ch}-{ca}")
             
             if corner_key not in sent_events:
                 old_ch, old_ca = last_corners.get(fid, (0, 0)) 
                 
-                print(f"[STATS] Corner update for #{fid}: {old_ch}-{old_ca} -> {ch}-{ca}")
+                stats_log.info("Corner update", extra=fields(fid=fid, old=f"{old_ch}-{old_ca}", new=f"{ch}-{ca}"))
                 
                 last_corners[fid] = (ch, ca)
                 sent_events.add(corner_key) 
@@ -261,22 +288,21 @@ def parse_events(fixture: dict, is_tracked_match: bool) -> list[str]:
                 if ch > old_ch and ca == old_ca: corner_team = home
                 elif ca > old_ca and ch == old_ch: corner_team = away
                 
-                team_msg = f" ({corner_team})" if corner_team else ""
-                
-                messages.append(
-                    f"{header}\n\n📐 Corner Kicks{team_msg}: {ch}–{ca}\n──────────────────"
-                )
+                ALERTS_TOTAL.inc(type="corners_stats")
+                messages.append(Alert(header, "corners_stats", {"team": corner_team, "home": ch, "away": ca}))
 
         # --- ОФСАЙДЫ (С ЗАЩИТОЙ ОТ ДУБЛИРОВАНИЯ) ---
         if last_offsides.get(fid) != (oh, oa):
-            offside_key = hashlib.md5(f"{fid}_OFFSIDES_{oh}-{oa}".encode()).hexdigest()
+            offside_key = _event_key(f"{fid}_OFFSIDES_{oh}-{oa}")
             
             if offside_key not in sent_events:
-                print(f"[STATS] Offside update for #{fid}: {oh}-{oa}")
+                stats_log.info("Offside update", extra=fields(fid=fid, offsides=f"{oh}-{oa}"))
                 last_offsides[fid] = (oh, oa)
                 sent_events.add(offside_key) 
-                messages.append(f"{header}\n\n🚩 Offsides: {oh}–{oa}\n──────────────────")
+                ALERTS_TOTAL.inc(type="offsides_stats")
+                messages.append(Alert(header, "offsides_stats", {"home": oh, "away": oa}))
 
     # ====================== КОНЕЦ ФУНКЦИИ (ОБЯЗАТЕЛЬНОЕ СОХРАНЕНИЕ КЭША) ======================
     save_sent_events(sent_events)
+    DEDUP_SET_SIZE.set(len(sent_events))
     return messages
\ No newline at end of file
@@ -0,0 +1,165 @@
+# bot_logging.py
+
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Any
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_RATE_WINDOW, LOG_SAMPLING, LOG_RATE_LIMITS
+
+# ====================== СТРУКТУРИРОВАННОЕ ЛОГИРОВАНИЕ ======================
+# Все логгеры бота живут под "bot.<категория>" (bot.api, bot.loop, bot.skip ...).
+# Записи фильтруются (уровень, сэмплинг, rate limit) прямо в вызывающем потоке,
+# а запись в stdout выполняет QueueListener в отдельном потоке — event loop
+# никогда не ждёт I/O.
+
+ROOT_LOGGER = "bot"
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def get_logger(category: str) -> logging.Logger:
+    """Возвращает логгер категории, например get_logger("api") -> "bot.api"."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def fields(**kwargs: Any) -> Dict[str, Any]:
+    """Структурированные поля записи: log.info("...", extra=fields(fid=1))."""
+    return {"fields": kwargs}
+
+
+def _category(record: logging.LogRecord) -> str:
+    return record.name.split(".", 1)[1] if "." in record.name else record.name
+
+
+class CategoryThrottleFilter(logging.Filter):
+    """Сэмплинг и ограничение частоты записей по категориям.
+
+    Предупреждения и ошибки не отбрасываются никогда.
+    """
+
+    def __init__(self, sampling: Dict[str, float], rate_limits: Dict[str, float], window: float):
+        super().__init__()
+        self.sampling = {name: max(1, round(1 / rate)) for name, rate in sampling.items() if rate > 0}
+        self.dropped_categories = {name for name, rate in sampling.items() if rate <= 0}
+        self.rate_limits = rate_limits
+        self.window = window
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self._window_start: Dict[str, float] = {}
+        self._window_count: Dict[str, int] = {}
+        self._suppressed: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        category = _category(record)
+        if category in self.dropped_categories:
+            return False
+
+        with self._lock:
+            every = self.sampling.get(category)
+            if every:
+                seen = self._seen.get(category, 0)
+                self._seen[category] = seen + 1
+                if seen % every:
+                    return False
+
+            limit = self.rate_limits.get(category)
+            if limit is None:
+                return True
+
+            now = time.monotonic()
+            if now - self._window_start.get(category, 0.0) >= self.window:
+                self._window_start[category] = now
+                self._window_count[category] = 0
+                suppressed = self._suppressed.pop(category, 0)
+                if suppressed:
+                    record.fields = {**getattr(record, "fields", {}), "suppressed": suppressed}
+
+            if self._window_count.get(category, 0) >= limit:
+                self._suppressed[category] = self._suppressed.get(category, 0) + 1
+                return False
+            self._window_count[category] = self._window_count.get(category, 0) + 1
+            return True
+
+
+class DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который только подставляет args в msg.
+
+    Трейсбек и поля форматирует уже поток QueueListener, а exc_info
+    сохраняется в записи для TextFormatter/JsonFormatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """2024-01-01 12:00:00 INFO  [loop] Cycle finished | fixtures=12 tracked=3"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = (
+            f"{self.formatTime(record, '%Y-%m-%d %H:%M:%S')} {record.levelname:<5} "
+            f"[{_category(record)}] {record.getMessage()}"
+        )
+        extra = getattr(record, "fields", None)
+        if extra:
+            line += " | " + " ".join(f"{key}={value}" for key, value in extra.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись — для сборщиков логов."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": record.created,
+            "level": record.levelname,
+            "category": _category(record),
+            "msg": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Настраивает логгер "bot" по config.py и запускает фоновый поток записи."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredFormatQueueHandler(log_queue)
+    queue_handler.addFilter(CategoryThrottleFilter(LOG_SAMPLING, LOG_RATE_LIMITS, LOG_RATE_WINDOW))
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(LOG_LEVEL)
+    root.handlers[:] = [queue_handler]
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Дописывает оставшиеся записи из очереди и останавливает поток записи."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
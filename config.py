@@ -23,3 +23,47 @@ LEAGUE_IDS = [
     4,     # UEFA Conference League
     114,   # AFCON
 ]
+
+# ====================== ЛОГИРОВАНИЕ ======================
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" или "json"
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "60"))
+
+def _parse_category_map(raw: str) -> dict[str, float]:
+    """Разбирает строку вида "skip=0.1,send=0.01" в словарь категория -> число."""
+    result: dict[str, float] = {}
+    for item in raw.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            result[name.strip()] = float(value)
+    return result
+
+# Доля записей, которые пишутся для категории (1.0 — все, 0.1 — каждая десятая)
+LOG_SAMPLING = _parse_category_map(os.getenv("LOG_SAMPLING", "skip=0.05,send=0.01"))
+# Максимум записей категории за LOG_RATE_WINDOW секунд, остальные отбрасываются
+LOG_RATE_LIMITS = _parse_category_map(os.getenv("LOG_RATE_LIMITS", "skip=200,track=500,send=200,parse=500"))
+
+# ====================== ПРОФИЛИРОВАНИЕ ======================
+# PROFILE_CYCLES > 0 включает профилирование первых N циклов после старта
+PROFILE_CYCLES = int(os.getenv("PROFILE_CYCLES", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_CPROFILE = os.getenv("PROFILE_CPROFILE", "0") == "1"
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "0") == "1"
+# Telegram user id, которому доступна /profile. По умолчанию TELEGRAM_CHAT_ID:
+# для личного чата он совпадает с id пользователя, а id группы (отрицательный)
+# не совпадёт ни с одним пользователем — команда будет закрыта для всех.
+ADMIN_USER_ID = os.getenv("ADMIN_USER_ID", CHAT_ID)
+
+# ====================== WEBHOOK ======================
+# Если задан WEBHOOK_URL (публичный https-адрес сервера keep_alive), бот получает
+# обновления через webhook вместо long polling. WEBHOOK_SECRET обязателен:
+# 1-256 символов A-Z, a-z, 0-9, "_" и "-".
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+# Flask требует маршрут с ведущим "/", поэтому "telegram/webhook" тоже допустим
+WEBHOOK_PATH = "/" + os.getenv("WEBHOOK_PATH", "/telegram/webhook").lstrip("/")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
+# ====================== ФОРМАТ СООБЩЕНИЙ ======================
+# Формат по умолчанию для чатов без своей настройки (/format)
+ALERT_LANG = os.getenv("ALERT_LANG", "en")
+ALERT_COMPACT = os.getenv("ALERT_COMPACT", "0") == "1"
@@ -1,22 +1,105 @@
-from flask import Flask
-from threading import Thread
+import asyncio
+import hmac
+from flask import Flask, Response, request
+from threading import Thread, Event
+from werkzeug.serving import make_server
+
+from telegram import Update
+from telegram.ext import Application
+
+from config import WEBHOOK_PATH, WEBHOOK_SECRET
+from metrics import render_latest, WEBHOOK_UPDATES
+from bot_logging import get_logger, fields
+
+log = get_logger("flask")
 
 app = Flask('')
 
+# Application и его event loop; задаются через attach_webhook() при старте бота в режиме webhook
+_webhook_target: tuple[Application, asyncio.AbstractEventLoop] | None = None
+
+# Устанавливается, когда поток сервера либо занял порт, либо упал при старте
+_server_ready = Event()
+_server_listening = False
+
 @app.route('/')
 def home():
     return "Football Alert Bot работает 24/7"
 
+@app.route('/metrics')
+def metrics():
+    return Response(render_latest(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route(WEBHOOK_PATH, methods=['POST'])
+def telegram_webhook():
+    """Принимает обновление от Telegram и передаёт его в update_queue бота."""
+    target = _webhook_target
+    if target is None:
+        WEBHOOK_UPDATES.inc(result="disabled")
+        return "Webhook mode is not enabled", 503
+
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    # Сравниваем байты: compare_digest для str падает на не-ASCII символах
+    if not WEBHOOK_SECRET or not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+        WEBHOOK_UPDATES.inc(result="forbidden")
+        log.warning("Rejected webhook request with invalid secret token", extra=fields(remote=request.remote_addr))
+        return "Forbidden", 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        WEBHOOK_UPDATES.inc(result="bad_request")
+        return "Bad Request", 400
+
+    application, loop = target
+    try:
+        update = Update.de_json(data, application.bot)
+    except Exception as e:
+        WEBHOOK_UPDATES.inc(result="bad_request")
+        log.warning("Could not parse webhook update", extra=fields(error=e))
+        return "Bad Request", 400
+    if update is None:
+        WEBHOOK_UPDATES.inc(result="bad_request")
+        return "Bad Request", 400
+    # Flask работает в своём потоке — кладём в asyncio.Queue через loop бота
+    asyncio.run_coroutine_threadsafe(application.update_queue.put(update), loop)
+    WEBHOOK_UPDATES.inc(result="accepted")
+    return "", 200
+
+def attach_webhook(application: Application, loop: asyncio.AbstractEventLoop):
+    """Включает приём обновлений на WEBHOOK_PATH для данного Application."""
+    global _webhook_target
+    _webhook_target = (application, loop)
+
+def detach_webhook():
+    global _webhook_target
+    _webhook_target = None
+
+def wait_until_serving(timeout: float) -> bool:
+    """True, если keep_alive() запустил сервер и он слушает порт."""
+    return _server_ready.wait(timeout) and _server_listening
+
 def keep_alive():
     def run():
-        print("[FLASK] Starting keep-alive webserver...")
+        global _server_listening
+        log.info("Starting keep-alive webserver")
+        try:
+            # make_server занимает порт сразу, поэтому ошибка bind видна до serve_forever
+            server = make_server('0.0.0.0', 8080, app, threaded=True)
+        except Exception:
+            log.exception("Webserver could not start")
+            _server_ready.set()
+            return
+
+        _server_listening = True
+        _server_ready.set()
         try:
-            app.run(host='0.0.0.0', port=8080)
-        except Exception as e:
-            print(f"[FLASK ERROR] {e}")
+            server.serve_forever()
+        except Exception:
+            _server_listening = False
+            log.exception("Webserver crashed")
 
     t = Thread(target=run)
     t.daemon = True
     t.start()
-    print("[FLASK] Thread started OK")
+    log.info("Webserver thread started")
 
@@ -1,15 +1,41 @@
 # main.py
 
 import asyncio
+import html
 import json
 import os
-from typing import Set, List 
+import time
+from typing import Set, List, Dict
 
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
+# Логирование настраивается до импорта модулей, которые пишут в лог при загрузке
+# (кэш событий в api_football, шаблоны в rendering)
+from bot_logging import setup_logging, shutdown_logging, get_logger, fields
+setup_logging()
+
 from api_football import get_live_fixtures, is_top5_league, parse_events
-from config import TOKEN, CHECK_INTERVAL 
+from config import (
+    TOKEN, CHECK_INTERVAL,
+    PROFILE_CYCLES, PROFILE_DIR, PROFILE_CPROFILE, PROFILE_TRACEMALLOC, ADMIN_USER_ID,
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+    ALERT_LANG, ALERT_COMPACT,
+)
+from profiling import profiler
+from rendering import Alert, Variant, TEMPLATES, render_alert, retain_fixtures
+from metrics import (
+    CYCLE_DURATION, CYCLES_TOTAL, LAST_CYCLE_TIMESTAMP, FIXTURES,
+    SEND_DURATION, SEND_FAILURES, monitor_event_loop_lag,
+)
+
+storage_log = get_logger("storage")
+command_log = get_logger("command")
+alert_log = get_logger("alert")
+send_log = get_logger("send")
+loop_log = get_logger("loop")
+skip_log = get_logger("skip")
+track_log = get_logger("track")
 
 # ====================== TRACKED MATCHES STORAGE ======================
 TRACKED_FILE = "tracked.json"
@@ -25,10 +51,10 @@ def load_tracked() -> Set[int]:
             if isinstance(data, dict) and "manual" in data:
                 return set(int(item) for item in data.get("manual", []) if str(item).isdigit())
             else:
-                print(f"[LOAD ERROR] Invalid file structure in {TRACKED_FILE}. Resetting tracking.")
+                storage_log.error("Invalid file structure, resetting tracking", extra=fields(file=TRACKED_FILE))
                 return set()
     except Exception as e:
-        print(f"[LOAD ERROR] Could not load tracked data from {TRACKED_FILE}: {e}. Resetting tracking.")
+        storage_log.error("Could not load tracked data, resetting tracking", extra=fields(file=TRACKED_FILE, error=e))
         return set()
 
 def save_tracked(tracked: Set[int]):
@@ -38,9 +64,9 @@ def save_tracked(tracked: Set[int]):
         with open(temp_file, "w", encoding="utf-8") as f:
             json.dump({"manual": list(tracked)}, f, ensure_ascii=False, indent=2)
         os.replace(temp_file, TRACKED_FILE)
-        print(f"[STORAGE] Tracked matches saved successfully.")
+        storage_log.info("Tracked matches saved", extra=fields(total=len(tracked)))
     except Exception as e:
-        print(f"[SAVE ERROR] Could not save tracked data: {e}")
+        storage_log.error("Could not save tracked data", extra=fields(error=e))
         if os.path.exists(temp_file):
             os.remove(temp_file)
 
@@ -60,10 +86,10 @@ def load_subscribers() -> Set[int]:
             if isinstance(data, list):
                 return set(int(item) for item in data if str(item).lstrip('-').isdigit())
             else:
-                print(f"[LOAD ERROR] Invalid file structure in {SUBSCRIBED_FILE}. Resetting subscribers.")
+                storage_log.error("Invalid file structure, resetting subscribers", extra=fields(file=SUBSCRIBED_FILE))
                 return set()
     except Exception as e:
-        print(f"[LOAD ERROR] Could not load subscriber data: {e}. Resetting subscriptions.")
+        storage_log.error("Could not load subscriber data, resetting subscriptions", extra=fields(error=e))
         return set()
 
 def save_subscribers(subscribed: Set[int]):
@@ -73,9 +99,9 @@ def save_subscribers(subscribed: Set[int]):
         with open(temp_file, "w", encoding="utf-8") as f:
             json.dump(list(subscribed), f, ensure_ascii=False, indent=2)
         os.replace(temp_file, SUBSCRIBED_FILE)
-        print(f"[STORAGE] Subscribed chats saved successfully. Total: {len(subscribed)}")
+        storage_log.info("Subscribed chats saved", extra=fields(total=len(subscribed)))
     except Exception as e:
-        print(f"[SAVE ERROR] Could not save subscribed data: {e}")
+        storage_log.error("Could not save subscribed data", extra=fields(error=e))
         if os.path.exists(temp_file):
             os.remove(temp_file)
 
@@ -95,7 +121,7 @@ def load_untracked_exceptions() -> Set[int]:
             # Убеждаемся, что каждый элемент - целое число
             return set(int(item) for item in data if str(item).lstrip('-').isdigit())
     except Exception as e:
-        print(f"[EXCEPTIONS ERROR] Failed to load untracked exceptions: {e}. Resetting.")
+        storage_log.error("Failed to load untracked exceptions, resetting", extra=fields(error=e))
         return set()
 
 def save_untracked_exceptions(exceptions: Set[int]):
@@ -105,15 +131,50 @@ def save_untracked_exceptions(exceptions: Set[int]):
         with open(temp_file, "w", encoding="utf-8") as f:
             json.dump(list(exceptions), f, ensure_ascii=False, indent=2)
         os.replace(temp_file, EXCEPTIONS_FILE)
-        print(f"[STORAGE] Untracked exceptions saved successfully.")
+        storage_log.info("Untracked exceptions saved", extra=fields(total=len(exceptions)))
     except Exception as e:
-        print(f"[EXCEPTIONS ERROR] Failed to save untracked exceptions: {e}")
+        storage_log.error("Failed to save untracked exceptions", extra=fields(error=e))
         if os.path.exists(temp_file):
             os.remove(temp_file)
 
 untracked_exceptions: Set[int] = load_untracked_exceptions()
 # ====================== КОНЕЦ НОВОГО БЛОКА ======================
 
+# ====================== CHAT FORMAT STORAGE ======================
+CHAT_FORMATS_FILE = "chat_formats.json"
+DEFAULT_VARIANT = Variant(ALERT_LANG if ALERT_LANG in TEMPLATES else "en", ALERT_COMPACT)
+
+def load_chat_formats() -> Dict[int, Variant]:
+    """Loads per-chat message format (language, compact mode)."""
+    if not os.path.exists(CHAT_FORMATS_FILE):
+        return {}
+    try:
+        with open(CHAT_FORMATS_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            return {
+                int(chat_id): Variant(fmt.get("lang", DEFAULT_VARIANT.lang), bool(fmt.get("compact", False)))
+                for chat_id, fmt in data.items()
+                if str(chat_id).lstrip('-').isdigit() and isinstance(fmt, dict)
+            }
+    except Exception as e:
+        storage_log.error("Could not load chat formats, resetting", extra=fields(error=e))
+        return {}
+
+def save_chat_formats(formats: Dict[int, Variant]):
+    """Saves per-chat message format to file."""
+    temp_file = CHAT_FORMATS_FILE + ".tmp"
+    try:
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump({str(chat_id): variant._asdict() for chat_id, variant in formats.items()}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, CHAT_FORMATS_FILE)
+        storage_log.info("Chat formats saved", extra=fields(total=len(formats)))
+    except Exception as e:
+        storage_log.error("Could not save chat formats", extra=fields(error=e))
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+chat_formats: Dict[int, Variant] = load_chat_formats()
+
 
 async def allgames(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Shows ALL matches currently being tracked by the bot (Top-5 + Manual)."""
@@ -174,8 +235,8 @@ async def allgames(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         
         await message.reply_html(text)
 
-    except Exception as e:
-        print(f"[ALLGAMES ERROR] {e}")
+    except Exception:
+        command_log.exception("Failed to build /allgames reply")
         await message.reply_text("An error occurred while fetching live matches. Check bot logs.")
 
 # ... (start function без изменений)
@@ -190,7 +251,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if chat_id_to_add not in subscribed_chats:
         subscribed_chats.add(chat_id_to_add)
         save_subscribers(subscribed_chats)
-        print(f"[SUBSCRIBE] New subscription: {chat_id_to_add}")
+        command_log.info("New subscription", extra=fields(chat_id=chat_id_to_add))
         
         message_text = "✅ *Subscription confirmed!* You will receive notifications in this chat.\n\n"
     else:
@@ -206,7 +267,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "Commands:\n"
         "/track 123456789\n"
         "/untrack 123456789\n"
-        "/mygames — your tracked matches",
+        "/mygames — your tracked matches\n"
+        "/format ru compact — alert language and layout",
         parse_mode="HTML"
     )
 
@@ -300,32 +362,115 @@ async def mygames(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await message.reply_html(text)
 
 
-async def send_alert(text: str, app: Application):
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin-only: /profile [cycles] [cprofile] [mem] — профилирует следующие N циклов."""
+    message = update.effective_message
+    if not message or not update.effective_user:
+        return
+    if str(update.effective_user.id) != str(ADMIN_USER_ID):
+        await message.reply_text("This command is available to the bot admin only.")
+        return
+
+    cycles = 3
+    use_cprofile = False
+    use_tracemalloc = False
+    for arg in (arg.lower() for arg in (context.args or [])):
+        if arg == "cprofile":
+            use_cprofile = True
+        elif arg == "mem":
+            use_tracemalloc = True
+        else:
+            try:
+                cycles = int(arg)
+            except ValueError:
+                await message.reply_html(
+                    f"Unknown option <code>{html.escape(arg)}</code>. Use: /profile [cycles] [cprofile] [mem]"
+                )
+                return
+    if cycles <= 0:
+        await message.reply_text("Number of cycles must be positive.")
+        return
+
+    output_dir = profiler.start(
+        cycles,
+        PROFILE_DIR,
+        use_cprofile=use_cprofile,
+        use_tracemalloc=use_tracemalloc,
+    )
+    if output_dir is None:
+        await message.reply_text("Could not create the profile directory. Check bot logs.")
+        return
+    await message.reply_html(
+        f"Profiling the next <b>{cycles}</b> cycle(s).\nResults: <code>{output_dir}</code>"
+    )
+
+
+async def format_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/format [en|ru] [compact|full] — формат уведомлений для этого чата."""
+    message = update.effective_message
+    if not message or not update.effective_chat:
+        return
+
+    chat_id = update.effective_chat.id
+    variant = chat_formats.get(chat_id, DEFAULT_VARIANT)
+    args = [arg.lower() for arg in (context.args or [])]
+
+    if not args:
+        await message.reply_html(
+            f"Current format: <b>{variant.lang}</b>, {'compact' if variant.compact else 'full'}\n\n"
+            f"/format &lt;{'|'.join(sorted(TEMPLATES))}&gt; [compact|full]"
+        )
+        return
+
+    for arg in args:
+        if arg in TEMPLATES:
+            variant = variant._replace(lang=arg)
+        elif arg in ("compact", "full"):
+            variant = variant._replace(compact=arg == "compact")
+        else:
+            await message.reply_html(f"Unknown option <code>{html.escape(arg)}</code>. Use: /format &lt;{'|'.join(sorted(TEMPLATES))}&gt; [compact|full]")
+            return
+
+    chat_formats[chat_id] = variant
+    save_chat_formats(chat_formats)
+    await message.reply_html(f"Format set: <b>{variant.lang}</b>, {'compact' if variant.compact else 'full'}")
+
+
+async def send_alert(alert: Alert, app: Application):
     if not subscribed_chats:
-        print("[ALERT] No active subscriptions. Skipping alert.")
+        alert_log.info("No active subscriptions, skipping alert")
         return
         
-    alert_text = text.strip()
+    # Текст собирается один раз на вариант формата, а не на каждый чат
+    rendered: Dict[Variant, str] = {}
     
     chats_to_remove = set() 
     
-    for chat_id in subscribed_chats:
+    for chat_id in list(subscribed_chats):
+        variant = chat_formats.get(chat_id, DEFAULT_VARIANT)
+        alert_text = rendered.get(variant)
+        if alert_text is None:
+            alert_text = rendered[variant] = render_alert(alert, variant).strip()
+
         try:
-            await app.bot.send_message(
-                chat_id=chat_id,
-                text=alert_text,
-                parse_mode="HTML",
-                disable_web_page_preview=True
-            )
-            print(f"[ALERT] Successfully sent message to chat {chat_id}")
+            with SEND_DURATION.time():
+                await app.bot.send_message(
+                    chat_id=chat_id,
+                    text=alert_text,
+                    parse_mode="HTML",
+                    disable_web_page_preview=True
+                )
+            send_log.debug("Message sent", extra=fields(chat_id=chat_id))
             
         except Exception as e:
             error_str = str(e)
             if "Forbidden" in error_str or "chat not found" in error_str: 
-                print(f"[SEND ERROR] Bot blocked/kicked or chat not found in {chat_id}. Marking for unsubscribing.")
+                SEND_FAILURES.inc(reason="forbidden")
+                send_log.warning("Bot blocked/kicked or chat not found, unsubscribing", extra=fields(chat_id=chat_id))
                 chats_to_remove.add(chat_id)
             else:
-                print(f"[SEND ERROR] Failed to send message to chat {chat_id}: {e}")
+                SEND_FAILURES.inc(reason="other")
+                send_log.warning("Failed to send message", extra=fields(chat_id=chat_id, error=e))
                 
     if chats_to_remove:
         subscribed_chats.difference_update(chats_to_remove)
@@ -334,27 +479,41 @@ async def send_alert(text: str, app: Application):
 
 # ====================== MAIN LOOP (ОБНОВЛЕННАЯ ЛОГИКА) ======================
 async def main_loop(app: Application):
-    print("\n[BOT] Starting main tracking loop...")
-    print(f"[BOT] Initial state: {len(manual_tracked)} manually tracked matches.")
-    print(f"[BOT] Initial exceptions: {len(untracked_exceptions)}.") # Добавлено логирование исключений
-    print(f"[BOT] Check interval set to {CHECK_INTERVAL} seconds.") 
-    print(f"[BOT] Active subscriptions: {len(subscribed_chats)} chats.")
+    loop_log.info("Starting main tracking loop", extra=fields(
+        manual=len(manual_tracked),
+        exceptions=len(untracked_exceptions),
+        interval=CHECK_INTERVAL,
+        subscriptions=len(subscribed_chats)))
     
+    if PROFILE_CYCLES > 0:
+        profiler.start(PROFILE_CYCLES, PROFILE_DIR, PROFILE_CPROFILE, PROFILE_TRACEMALLOC)
+
     cycle_count = 0
     
     while True:
         cycle_count += 1
-        print(f"\n--- Tracking Cycle #{cycle_count} ({len(manual_tracked)} manual, {len(subscribed_chats)} subs) ---")
+        loop_log.debug("Tracking cycle started", extra=fields(cycle=cycle_count, manual=len(manual_tracked), subs=len(subscribed_chats)))
+        cycle_start = time.perf_counter()
+        profiler.begin_cycle(cycle_count)
         
         try:
             fixtures = get_live_fixtures() 
             
             if not fixtures:
-                print("[LOOP] No live fixtures found. Waiting...")
+                loop_log.info("No live fixtures found, waiting", extra=fields(cycle=cycle_count))
+                FIXTURES.set(0, state="polled")
+                FIXTURES.set(0, state="tracked")
+                FIXTURES.set(0, state="skipped")
+                CYCLES_TOTAL.inc(outcome="empty")
+                retain_fixtures(set())
+                CYCLE_DURATION.observe(time.perf_counter() - cycle_start)
+                LAST_CYCLE_TIMESTAMP.set(time.time())
+                profiler.end_cycle()
                 await asyncio.sleep(CHECK_INTERVAL) 
                 continue
 
             matches_to_analyze = 0
+            matches_skipped = 0
 
             for fixture in fixtures:
                 fid = fixture["fixture"]["id"]
@@ -375,7 +534,8 @@ async def main_loop(app: Application):
                     if not is_top5 and not is_manual:
                         reason.append("Not Tracked")
                         
-                    print(f"[SKIP] Fixture #{fid} ({home} vs {away}) - Reason: {', '.join(reason)}")
+                    skip_log.debug("Skipping fixture", extra=fields(fid=fid, home=home, away=away, reason=', '.join(reason)))
+                    matches_skipped += 1
                     continue
                 
                 matches_to_analyze += 1
@@ -387,27 +547,73 @@ async def main_loop(app: Application):
                 else:
                     track_type = "Manual"
                     
-                print(f"[TRACK] Analyzing Fixture #{fid} ({home} vs {away}) - Reason: {track_type}")
+                track_log.debug("Analyzing fixture", extra=fields(fid=fid, home=home, away=away, reason=track_type))
 
-                messages = parse_events(fixture, is_tracked_match) 
+                with profiler.stage("parse"):
+                    messages = parse_events(fixture, is_tracked_match) 
                 
                 if messages:
-                    print(f"[TRACK] Found {len(messages)} new alert(s) for #{fid}")
+                    track_log.info("New alerts found", extra=fields(fid=fid, count=len(messages)))
                 
                 for msg in messages:
-                    await send_alert(msg, app) 
-
-            print(f"[LOOP] Analysis complete. {matches_to_analyze} matches processed.")
+                    with profiler.stage("send"):
+                        await send_alert(msg, app) 
+
+            retain_fixtures({fixture["fixture"]["id"] for fixture in fixtures})
+            loop_log.info("Cycle finished", extra=fields(cycle=cycle_count, polled=len(fixtures), tracked=matches_to_analyze, skipped=matches_skipped))
+            FIXTURES.set(len(fixtures), state="polled")
+            FIXTURES.set(matches_to_analyze, state="tracked")
+            FIXTURES.set(matches_skipped, state="skipped")
+            CYCLES_TOTAL.inc(outcome="ok")
             
-        except Exception as e:
-            print(f"[LOOP ERROR] An unexpected error occurred in the main loop: {e}")
+        except Exception:
+            loop_log.exception("Unexpected error in the main loop")
+            CYCLES_TOTAL.inc(outcome="error")
             
+        CYCLE_DURATION.observe(time.perf_counter() - cycle_start)
+        LAST_CYCLE_TIMESTAMP.set(time.time())
+        profiler.end_cycle()
+
         await asyncio.sleep(CHECK_INTERVAL)
 
 # ====================== BOT STARTUP ======================
+async def start_webhook(app: Application) -> bool:
+    """Регистрирует webhook на сервере keep_alive. False — нужно откатиться на polling."""
+    if not WEBHOOK_URL:
+        return False
+    if not WEBHOOK_SECRET:
+        loop_log.warning("WEBHOOK_URL is set but WEBHOOK_SECRET is empty, falling back to polling")
+        return False
+
+    try:
+        import keep_alive
+    except ImportError:
+        loop_log.warning("Webserver is unavailable, falling back to polling")
+        return False
+
+    # Без работающего сервера webhook отрезал бы бота от всех обновлений
+    if not await asyncio.to_thread(keep_alive.wait_until_serving, 10):
+        loop_log.warning("Webserver is not listening, falling back to polling")
+        return False
+
+    keep_alive.attach_webhook(app, asyncio.get_running_loop())
+    try:
+        await app.bot.set_webhook(
+            url=f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+    except Exception:
+        keep_alive.detach_webhook()
+        loop_log.exception("Could not register webhook, falling back to polling")
+        return False
+
+    loop_log.info("Webhook registered — bot is alive!", extra=fields(url=f"{WEBHOOK_URL}{WEBHOOK_PATH}"))
+    return True
+
 async def main():
     if not TOKEN or TOKEN == "YOUR_TELEGRAM_BOT_TOKEN_HERE":
-        print("ERROR: Please set your Telegram TOKEN in config.py")
+        loop_log.error("Telegram TOKEN is not set, check .env")
         return
         
     app = Application.builder().token(TOKEN).build()
@@ -417,12 +623,18 @@ async def main():
     app.add_handler(CommandHandler("untrack", untrack))
     app.add_handler(CommandHandler("mygames", mygames))
     app.add_handler(CommandHandler("allgames", allgames))
+    app.add_handler(CommandHandler("profile", profile))
+    app.add_handler(CommandHandler("format", format_command))
 
     await app.initialize()
     await app.start()
-    await app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+    if not await start_webhook(app):
+        # start_polling сам снимает ранее установленный webhook
+        await app.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        loop_log.info("Polling started — bot is alive!")
 
-    print("Polling started — bot is alive!")
+    # Фоновый замер задержки event loop и очереди обновлений для /metrics
+    lag_monitor = asyncio.create_task(monitor_event_loop_lag(app.update_queue))
     await main_loop(app)
 
 if __name__ == "__main__":
@@ -432,4 +644,7 @@ if __name__ == "__main__":
     except ImportError:
         pass
 
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_logging()
\ No newline at end of file
@@ -0,0 +1,202 @@
+# metrics.py
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple, List
+
+# ====================== PROMETHEUS-СОВМЕСТИМЫЕ МЕТРИКИ ======================
+# Небольшая реализация без внешних зависимостей: счётчики, gauge и гистограммы
+# с метками. Flask отдаёт их из отдельного потока, поэтому всё под одним lock.
+
+_lock = threading.Lock()
+_registry: List["_Metric"] = []
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = float(value)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Замеряет длительность блока в секундах."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        bucket_names = self.labelnames + ("le",)
+        for key, state in self._values.items():
+            for i, bound in enumerate(self.buckets):
+                lines.append(f"{self.name}_bucket{_format_labels(bucket_names, key + (repr(bound),))} {state[i]}")
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_names, key + ('+Inf',))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+def render_latest() -> str:
+    """Текст всех метрик в формате Prometheus exposition (text/plain; version=0.0.4)."""
+    with _lock:
+        return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# ====================== МЕТРИКИ БОТА ======================
+CYCLE_DURATION = Histogram(
+    "football_bot_cycle_duration_seconds", "Duration of one tracking cycle."
+)
+CYCLES_TOTAL = Counter(
+    "football_bot_cycles_total", "Tracking cycles completed, by outcome.", ("outcome",)
+)
+LAST_CYCLE_TIMESTAMP = Gauge(
+    "football_bot_last_cycle_timestamp_seconds", "Unix time when the last tracking cycle finished."
+)
+API_REQUEST_DURATION = Histogram(
+    "football_bot_api_request_duration_seconds", "API-Football request latency.", ("endpoint",)
+)
+API_REQUEST_ERRORS = Counter(
+    "football_bot_api_request_errors_total", "Failed API-Football requests.", ("endpoint",)
+)
+API_QUOTA_REMAINING = Gauge(
+    "football_bot_api_quota_remaining", "Remaining API-Football quota reported by response headers.", ("window",)
+)
+FIXTURES = Gauge(
+    "football_bot_fixtures", "Live fixtures seen in the last cycle, by state.", ("state",)
+)
+ALERTS_TOTAL = Counter(
+    "football_bot_alerts_total", "Alerts generated, by event type.", ("type",)
+)
+SEND_DURATION = Histogram(
+    "football_bot_send_duration_seconds", "Telegram send_message latency.",
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SEND_FAILURES = Counter(
+    "football_bot_send_failures_total", "Failed Telegram sends, by reason.", ("reason",)
+)
+UPDATE_QUEUE_DEPTH = Gauge(
+    "football_bot_update_queue_depth", "Telegram updates waiting in the Application update queue."
+)
+DEDUP_SET_SIZE = Gauge(
+    "football_bot_dedup_set_size", "Number of event hashes in the sent-events cache."
+)
+WEBHOOK_UPDATES = Counter(
+    "football_bot_webhook_updates_total", "Telegram webhook requests, by result.", ("result",)
+)
+EVENT_LOOP_LAG = Histogram(
+    "football_bot_event_loop_lag_seconds", "Delay between scheduled and actual event-loop wakeups.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    "football_bot_event_loop_lag_last_seconds", "Most recent event-loop lag sample."
+)
+
+
+async def monitor_event_loop_lag(update_queue: asyncio.Queue | None = None, interval: float = 1.0):
+    """Фоновая задача: меряет, насколько позже запланированного просыпается event loop,
+    и глубину очереди обновлений Telegram."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+        if update_queue is not None:
+            UPDATE_QUEUE_DEPTH.set(update_queue.qsize())
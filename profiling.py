@@ -0,0 +1,175 @@
+# profiling.py
+
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, ContextManager
+
+from bot_logging import get_logger, fields
+
+log = get_logger("profile")
+
+# ====================== ПРОФИЛИРОВАНИЕ ЦИКЛА ОТСЛЕЖИВАНИЯ ======================
+# Включается на N ближайших циклов (PROFILE_CYCLES в .env или /profile).
+# Пока режим выключен, stage() — пустой контекстный менеджер.
+#
+# Результаты в PROFILE_DIR/<время запуска>/:
+#   stages.folded        — self-time стадий в формате collapsed stacks
+#                          (flamegraph.pl, speedscope, inferno)
+#   stages.jsonl         — по строке на цикл: длительность стадий в мс
+#   main_loop.prof       — дамп cProfile (snakeviz, flameprof, pstats)
+#   tracemalloc.snapshot — снимок tracemalloc (tracemalloc.Snapshot.load)
+#   tracemalloc_top.txt  — топ аллокаций по строкам кода
+#
+# Ошибки записи на диск логируются и выключают профилирование — цикл
+# отслеживания из-за них никогда не падает.
+
+_NO_STAGE = nullcontext()
+
+
+class CycleProfiler:
+    def __init__(self):
+        self.remaining = 0
+        self.use_cprofile = False
+        self.use_tracemalloc = False
+        self.output_dir = ""
+        self._cycle: int | None = None
+        self._cycle_start = 0.0
+        self._stack: List[list] = []
+        self._self_time: Dict[str, float] = {}
+        self._total_time: Dict[str, float] = {}
+        self._folded: Dict[str, float] = {}
+        self._profile: cProfile.Profile | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.remaining > 0
+
+    def start(self, cycles: int, base_dir: str, use_cprofile: bool = False, use_tracemalloc: bool = False) -> str | None:
+        """Включает профилирование следующих `cycles` циклов.
+
+        Возвращает каталог с результатами или None, если его не удалось создать.
+        """
+        if self.active:
+            self._finish()
+        output_dir = os.path.join(base_dir, time.strftime("%Y%m%d-%H%M%S"))
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+        except OSError as e:
+            log.error("Could not create profile directory, profiling disabled", extra=fields(dir=output_dir, error=e))
+            return None
+        self.remaining = cycles
+        self.use_cprofile = use_cprofile
+        self.use_tracemalloc = use_tracemalloc
+        self.output_dir = output_dir
+        self._folded = {}
+        if use_cprofile:
+            self._profile = cProfile.Profile()
+        if use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        log.info("Profiling enabled", extra=fields(
+            cycles=cycles, cprofile=use_cprofile, tracemalloc=use_tracemalloc, dir=self.output_dir))
+        return self.output_dir
+
+    def begin_cycle(self, cycle: int):
+        if not self.active:
+            return
+        self._cycle = cycle
+        self._cycle_start = time.perf_counter()
+        self._stack = []
+        self._self_time = {}
+        self._total_time = {}
+        if self._profile is not None:
+            self._profile.enable()
+
+    def end_cycle(self):
+        if self._cycle is None:
+            return
+        if self._profile is not None:
+            self._profile.disable()
+
+        elapsed = time.perf_counter() - self._cycle_start
+        staged = sum(self._self_time.values())
+        self._self_time["main_loop"] = max(0.0, elapsed - staged)
+        for path, seconds in self._self_time.items():
+            self._folded[path] = self._folded.get(path, 0.0) + seconds
+
+        record = {
+            "cycle": self._cycle,
+            "total_ms": round(elapsed * 1000, 3),
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self._total_time.items()},
+        }
+        try:
+            with open(os.path.join(self.output_dir, "stages.jsonl"), "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            log.error("Could not write cycle profile, profiling disabled", extra=fields(dir=self.output_dir, error=e))
+            self._stop()
+            return
+        log.info("Cycle profiled", extra=fields(cycle=self._cycle, total_ms=record["total_ms"], **record["stages_ms"]))
+
+        self._cycle = None
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self._finish()
+
+    def stage(self, name: str) -> ContextManager:
+        """Замеряет стадию цикла; вложенные стадии дают путь вида main_loop;parse;hash."""
+        if self._cycle is None:
+            return _NO_STAGE
+        return self._stage(name)
+
+    @contextmanager
+    def _stage(self, name: str):
+        frame = [name, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            path = ";".join(["main_loop"] + [f[0] for f in self._stack] + [name])
+            self._self_time[path] = self._self_time.get(path, 0.0) + elapsed - frame[2]
+            self._total_time[name] = self._total_time.get(name, 0.0) + elapsed
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def _finish(self):
+        """Записывает накопленные результаты на диск и выключает профилирование."""
+        try:
+            # Значения в микросекундах: flamegraph-инструменты ждут целые "сэмплы"
+            with open(os.path.join(self.output_dir, "stages.folded"), "w", encoding="utf-8") as f:
+                for path, seconds in sorted(self._folded.items()):
+                    f.write(f"{path} {max(1, round(seconds * 1_000_000))}\n")
+
+            if self._profile is not None:
+                self._profile.dump_stats(os.path.join(self.output_dir, "main_loop.prof"))
+
+            if self.use_tracemalloc and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                snapshot.dump(os.path.join(self.output_dir, "tracemalloc.snapshot"))
+                with open(os.path.join(self.output_dir, "tracemalloc_top.txt"), "w", encoding="utf-8") as f:
+                    for stat in snapshot.statistics("lineno")[:50]:
+                        f.write(f"{stat}\n")
+        except OSError as e:
+            log.error("Could not write profiling results", extra=fields(dir=self.output_dir, error=e))
+        else:
+            log.info("Profiling finished", extra=fields(dir=self.output_dir))
+        finally:
+            self._stop()
+
+    def _stop(self):
+        """Выключает профилирование без записи результатов."""
+        self.remaining = 0
+        self._cycle = None
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile = None
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+profiler = CycleProfiler()
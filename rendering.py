@@ -0,0 +1,131 @@
+# rendering.py
+
+import json
+from typing import Dict, NamedTuple, Tuple, Any, Set
+
+from bot_logging import get_logger, fields
+
+log = get_logger("render")
+
+# ====================== ШАБЛОНЫ СООБЩЕНИЙ ======================
+# Шаблоны всех языков загружаются один раз при старте. parse_events отдаёт
+# структурированные Alert, а текст собирается здесь — один раз на вариант
+# формата (язык + компактный режим), а не на каждый чат.
+TEMPLATES_FILE = "templates.json"
+DEFAULT_LANG = "en"
+
+LEAGUE_FLAGS = {
+    39: "🏴", 140: "🇪🇸", 135: "🇮🇹",
+    78: "🇩🇪", 61: "🇫🇷"
+}
+
+
+def load_templates() -> Dict[str, Dict[str, str]]:
+    """Загружает шаблоны; недостающие ключи языка берутся из DEFAULT_LANG."""
+    with open(TEMPLATES_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    base = data[DEFAULT_LANG]
+    templates = {}
+    for lang, strings in data.items():
+        missing = set(base) - set(strings)
+        if missing:
+            log.warning("Templates are incomplete, using defaults", extra=fields(lang=lang, missing=sorted(missing)))
+        templates[lang] = {**base, **strings}
+    return templates
+
+
+TEMPLATES: Dict[str, Dict[str, str]] = load_templates()  # ЗАГРУЗКА ПРИ СТАРТЕ
+
+
+class Variant(NamedTuple):
+    """Формат сообщений для чата."""
+    lang: str = DEFAULT_LANG
+    compact: bool = False
+
+
+class Header(NamedTuple):
+    """Состояние матча, от которого зависит заголовок сообщения."""
+    fid: int
+    league_id: int
+    league: str
+    round: str
+    home: str
+    away: str
+    gh: int
+    ga: int
+
+
+class Alert(NamedTuple):
+    """Событие для отправки: kind — ключ шаблона, params — его параметры."""
+    header: Header
+    kind: str
+    params: Dict[str, Any]
+
+
+def fixture_header(fixture: dict) -> Header:
+    return Header(
+        fid=fixture["fixture"]["id"],
+        league_id=fixture["league"]["id"],
+        league=fixture["league"]["name"],
+        round=fixture["league"].get("round") or "",
+        home=fixture["teams"]["home"]["name"],
+        away=fixture["teams"]["away"]["name"],
+        gh=fixture["goals"]["home"] or 0,
+        ga=fixture["goals"]["away"] or 0,
+    )
+
+
+# (fid, variant) -> (header, текст). Запись заменяется, когда меняется счёт или тур.
+_header_cache: Dict[Tuple[int, Variant], Tuple[Header, str]] = {}
+
+
+def render_header(header: Header, variant: Variant) -> str:
+    key = (header.fid, variant)
+    cached = _header_cache.get(key)
+    if cached is not None and cached[0] == header:
+        return cached[1]
+
+    strings = TEMPLATES.get(variant.lang, TEMPLATES[DEFAULT_LANG])
+    template = strings["header_compact"] if variant.compact else strings["header"]
+    text = template.format(
+        flag=LEAGUE_FLAGS.get(header.league_id, ""),
+        league=header.league,
+        round=header.round.replace("Regular Season - ", strings["matchday"]),
+        home=header.home,
+        away=header.away,
+        gh=header.gh,
+        ga=header.ga,
+    )
+    _header_cache[key] = (header, text)
+    return text
+
+
+def retain_fixtures(live_fids: Set[int]):
+    """Удаляет из кэша заголовки матчей, которых больше нет в live."""
+    for key in [key for key in _header_cache if key[0] not in live_fids]:
+        del _header_cache[key]
+
+
+def render_alert(alert: Alert, variant: Variant) -> str:
+    strings = TEMPLATES.get(variant.lang, TEMPLATES[DEFAULT_LANG])
+    params = alert.params
+
+    if alert.kind == "goal":
+        body = strings["goal"].format(
+            own=strings["own_goal"] if params["own"] else "",
+            pen=strings["penalty"] if params["penalty"] else "",
+            player=params["player"] or strings["unknown_player"],
+            assist=params["assist"] or strings["no_assist"],
+            time=params["time"],
+        )
+    elif alert.kind == "corners_stats":
+        team = strings["corners_stats_team"].format(team=params["team"]) if params["team"] else ""
+        body = strings["corners_stats"].format(team=team, home=params["home"], away=params["away"])
+    else:
+        body = strings[alert.kind].format(**{
+            key: (strings["unknown_player"] if value is None and key.startswith("player") else value)
+            for key, value in params.items()
+        })
+
+    return strings["alert"].format(header=render_header(alert.header, variant), body=body)